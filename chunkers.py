@@ -1,15 +1,157 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 import re
 import json
 from bs4 import BeautifulSoup
-import uuid
+import os
 from typing import List, Dict, Any, Tuple, Optional
+from jsonutil import json_dumps, json_loads
+
+# Prefer the C-backed lxml parser for BeautifulSoup, fall back to the pure-Python one
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = 'lxml'
+except ImportError:
+    _HTML_PARSER = 'html.parser'
+
+def _fast_id() -> str:
+    """Return a random 128-bit hex id for a chunk (cheaper than str(uuid.uuid4()))"""
+    return os.urandom(16).hex()
+
+def _start_with_overlap(previous: str, piece: str, separator_size: int, chunk_size: int, chunk_overlap: int) -> Tuple[List[str], int]:
+    """Start a new text chunk with piece, prefixed by the tail of the previous chunk
+    
+    The carried tail is at most chunk_overlap characters and is shortened so the
+    new chunk stays within chunk_size. Returns the chunk parts and their size.
+    """
+    tail_size = min(chunk_overlap, chunk_size - len(piece) - separator_size)
+    if previous and tail_size > 0:
+        tail = previous[-tail_size:]
+        if tail_size < len(previous) and not previous[-tail_size - 1].isspace():
+            # The cut falls inside a word: start the tail at the next word boundary,
+            # or carry no overlap when the tail is a single unbroken token
+            boundary = _WHITESPACE_RE.search(tail)
+            tail = tail[boundary.start():] if boundary else ""
+        tail = tail.lstrip()
+        if tail:
+            return [tail, piece], len(tail) + separator_size + len(piece)
+    return [piece], len(piece)
+
+def _outermost_sections(soup: BeautifulSoup) -> List[Any]:
+    """Return the outermost semantic section elements in document order"""
+    sections = []
+    stack = list(reversed(soup.contents))
+    while stack:
+        node = stack.pop()
+        if node.name is None:
+            # Text, comments and other non-element nodes
+            continue
+        if node.name in _SECTION_TAGS:
+            sections.append(node)
+        else:
+            stack.extend(reversed(node.contents))
+    return sections
+
+def _coerce_meta_content(value: str):
+    """Convert a <meta> content string to bool, int or float when it looks like one"""
+    lowered = value.lower()
+    if lowered == 'true':
+        return True
+    if lowered == 'false':
+        return False
+    number = _META_NUMBER_RE.fullmatch(value)
+    if number:
+        return float(value) if '.' in value else int(value)
+    return value
+
+def _validate_metadata_value(value):
+    """Ensure metadata value is a valid type (str, int, float, bool, None)"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # Convert lists to string
+    elif isinstance(value, list):
+        return ' '.join(str(item) for item in value)
+    # Convert other types to string
+    else:
+        return str(value)
+
+# Metadata templates, copied and filled in for each emitted chunk
+_TEXT_META = {"chunk_type": "text"}
+_JSON_META = {"chunk_type": "json"}
+
+# Semantic section tags used to chunk HTML
+_SECTION_TAGS = frozenset(['div', 'section', 'article', 'main', 'header', 'footer', 'nav', 'aside'])
+
+# Precompiled patterns used on the chunking hot paths
+_PARA_RE = re.compile(r'\n\s*\n')
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+_WHITESPACE_RE = re.compile(r'\s')
+
+# Classifies a line of code as an import, function start or class start in one match
+_CODE_LINE_RE = re.compile(
+    r'\s*(?:'
+    r'(?P<imp>(?:import|from|#include|using)\s+)'
+    r'|(?P<func>(?:def|function|public|private|protected)\s+[\w]+\s*\()'
+    r'|(?P<cls>class\s+[\w]+)'
+    r')'
+)
+
+# Simple language detection based on file patterns
+_LANGUAGE_PROBE_SIZE = 64 * 1024
+_LANGUAGE_PATTERNS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(pattern, re.IGNORECASE), language)
+    for pattern, language in (
+        (r'import\s+[\w\.]+|from\s+[\w\.]+\s+import', 'python'),
+        (r'function\s+[\w]+\s*\(|const\s+[\w]+\s*=|let\s+[\w]+\s*=|var\s+[\w]+\s*=', 'javascript'),
+        (r'public\s+class|private\s+class|protected\s+class', 'java'),
+        (r'#include\s*<|#include\s*"', 'c/c++'),
+        (r'package\s+[\w\.]+;', 'java'),
+        (r'using\s+[\w\.]+;', 'c#'),
+        (r'<!DOCTYPE\s+html|<html', 'html'),
+        (r'<\?php', 'php'),
+    )
+]
+
+_META_NUMBER_RE = re.compile(r'\d+(?:\.\d*)?|\.\d+')
+_HEAD_RE = re.compile(r'\s*(.{0,16})', re.DOTALL)
+_HTML_PREFIXES = ('<!doctype html', '<html', '<body', '<div', '<p>', '<head>')
+_HTML_RE = re.compile(r'<!DOCTYPE\s+html|<html|<body|<div|<p>|<head>', re.IGNORECASE)
+_JSON_FRAGMENT_RE = re.compile(r'(\{[\s\S]*?\}|\[[\s\S]*?\])')
+# Each code pattern is paired with the literal keywords it cannot match without,
+# so a cheap substring test can rule it out before the regex scan runs
+_CODE_PATTERNS: List[Tuple[Tuple[str, ...], re.Pattern]] = [
+    (keywords, re.compile(pattern, re.IGNORECASE))
+    for keywords, pattern in (
+        (('import',), r'import\s+[\w\.]+|from\s+[\w\.]+\s+import'),  # Python
+        (('function', 'const', 'let'), r'function\s+[\w]+\s*\(|const\s+[\w]+\s*=|let\s+[\w]+\s*='),  # JavaScript
+        (('class',), r'public\s+class|private\s+class|protected\s+class'),  # Java
+        (('#include',), r'#include\s*<|#include\s*"'),  # C/C++
+        (('package',), r'package\s+[\w\.]+;'),  # Java
+        (('using',), r'using\s+[\w\.]+;'),  # C#
+        (('<?php',), r'<\?php'),  # PHP
+    )
+]
+
+@dataclass(slots=True)
+class Chunk:
+    """A piece of chunked content with its metadata
+    
+    Slotted to keep per-chunk overhead low; item access (chunk['content'],
+    chunk['metadata']) is kept for callers written against the old dict shape.
+    """
+    content: str
+    metadata: Dict[str, Any]
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
 
 class BaseChunker(ABC):
     """Base abstract class for all chunkers"""
     
     @abstractmethod
-    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Dict[str, Any]]:
+    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Chunk]:
         """Chunk the content into smaller pieces
         
         Args:
@@ -18,32 +160,31 @@ class BaseChunker(ABC):
             chunk_overlap: The overlap between chunks
             
         Returns:
-            List of dictionaries with 'content' and 'metadata' keys
+            List of Chunk objects with 'content' and 'metadata' attributes
         """
         pass
 
 class TextChunker(BaseChunker):
     """Chunker for plain text content"""
     
-    def _validate_metadata_value(self, value):
-        """Ensure metadata value is a valid type (str, int, float, bool, None)"""
-        if value is None or isinstance(value, (str, int, float, bool)):
-            return value
-        # Convert lists to string
-        elif isinstance(value, list):
-            return ' '.join(str(item) for item in value)
-        # Convert other types to string
-        else:
-            return str(value)
-    
-    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Dict[str, Any]]:
-        """Chunk text content by paragraphs, then sentences, then characters"""
+    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Chunk]:
+        """Chunk text content by paragraphs, then sentences, then characters
+        
+        Each chunk starts with up to chunk_overlap trailing characters of the previous one.
+        """
+        # An overlap of chunk_size or more would make the character windows below
+        # advance one character at a time (or skip short sentences entirely)
+        chunk_overlap = max(0, min(chunk_overlap, chunk_size - 1))
+        
         # First try to split by paragraphs
-        paragraphs = re.split(r'\n\s*\n', content)
+        paragraphs = _PARA_RE.split(content)
         
         chunks = []
-        current_chunk = ""
+        # Accumulate fragments and join once per emitted chunk
+        current_parts: List[str] = []
         current_size = 0
+        # Text of the last emitted chunk; its tail is carried into the next chunk as overlap
+        previous = ""
         
         for para in paragraphs:
             para = para.strip()
@@ -51,177 +192,153 @@ class TextChunker(BaseChunker):
                 continue
                 
             # If paragraph fits in current chunk, add it
-            if current_size + len(para) <= chunk_size:
-                if current_chunk:
-                    current_chunk += "\n\n"
-                current_chunk += para
-                current_size += len(para) + 2  # +2 for the newlines
+            if not current_parts and len(para) <= chunk_size:
+                current_parts, current_size = _start_with_overlap(previous, para, 2, chunk_size, chunk_overlap)
+            elif current_parts and current_size + 2 + len(para) <= chunk_size:  # +2 for the newlines
+                current_parts.append(para)
+                current_size += len(para) + 2
             else:
                 # If current chunk is not empty, add it to chunks
-                if current_chunk:
-                    chunks.append({
-                        "content": current_chunk,
-                        "metadata": {
-                            "chunk_type": self._validate_metadata_value("text"),
-                            "chunk_id": str(uuid.uuid4()),
-                            "chunk_index": len(chunks)
-                        }
-                    })
+                if current_parts:
+                    previous = "\n\n".join(current_parts)
+                    chunk_metadata = _TEXT_META.copy()
+                    chunk_metadata["chunk_id"] = _fast_id()
+                    chunk_metadata["chunk_index"] = len(chunks)
+                    chunks.append(Chunk(content=previous, metadata=chunk_metadata))
                 
                 # Start a new chunk with this paragraph
                 # If paragraph is larger than chunk_size, we'll need to split it further
                 if len(para) > chunk_size:
                     # Split by sentences
-                    sentences = re.split(r'(?<=[.!?])\s+', para)
+                    sentences = _SENT_RE.split(para)
                     
-                    current_chunk = ""
+                    current_parts = []
                     current_size = 0
                     
                     for sentence in sentences:
-                        if current_size + len(sentence) <= chunk_size:
-                            if current_chunk:
-                                current_chunk += " "
-                            current_chunk += sentence
-                            current_size += len(sentence) + 1  # +1 for the space
+                        if not current_parts and len(sentence) <= chunk_size:
+                            current_parts, current_size = _start_with_overlap(previous, sentence, 1, chunk_size, chunk_overlap)
+                        elif current_parts and current_size + 1 + len(sentence) <= chunk_size:  # +1 for the space
+                            current_parts.append(sentence)
+                            current_size += len(sentence) + 1
                         else:
                             # If sentence doesn't fit and we have content, add current chunk
-                            if current_chunk:
-                                chunks.append({
-                                    "content": current_chunk,
-                                    "metadata": {
-                                        "chunk_type": self._validate_metadata_value("text"),
-                                        "chunk_id": str(uuid.uuid4()),
-                                        "chunk_index": len(chunks)
-                                    }
-                                })
+                            if current_parts:
+                                previous = " ".join(current_parts)
+                                chunk_metadata = _TEXT_META.copy()
+                                chunk_metadata["chunk_id"] = _fast_id()
+                                chunk_metadata["chunk_index"] = len(chunks)
+                                chunks.append(Chunk(content=previous, metadata=chunk_metadata))
                             
                             # If sentence is still too long, split by characters
                             if len(sentence) > chunk_size:
-                                for i in range(0, len(sentence), chunk_size - chunk_overlap):
-                                    chunk_text = sentence[i:i + chunk_size]
-                                    chunks.append({
-                                        "content": chunk_text,
-                                        "metadata": {
-                                            "chunk_type": self._validate_metadata_value("text"),
-                                            "chunk_id": str(uuid.uuid4()),
-                                            "chunk_index": len(chunks)
-                                        }
-                                    })
+                                # Fixed-size overlapping windows, one slice per chunk; stop once
+                                # a window reaches the end so no tail window is fully contained
+                                # in the previous one
+                                step = max(chunk_size - chunk_overlap, 1)
+                                for i in range(0, len(sentence) - chunk_overlap, step):
+                                    previous = sentence[i:i + chunk_size]
+                                    chunk_metadata = _TEXT_META.copy()
+                                    chunk_metadata["chunk_id"] = _fast_id()
+                                    chunk_metadata["chunk_index"] = len(chunks)
+                                    chunks.append(Chunk(content=previous, metadata=chunk_metadata))
+                                current_parts = []
+                                current_size = 0
                             else:
                                 # Start new chunk with this sentence
-                                current_chunk = sentence
-                                current_size = len(sentence)
+                                current_parts, current_size = _start_with_overlap(previous, sentence, 1, chunk_size, chunk_overlap)
+                    
+                    # Sentences are space-joined; collapse them so later
+                    # paragraphs are joined with newlines
+                    if len(current_parts) > 1:
+                        current_parts = [" ".join(current_parts)]
                 else:
-                    current_chunk = para
-                    current_size = len(para)
+                    current_parts, current_size = _start_with_overlap(previous, para, 2, chunk_size, chunk_overlap)
         
         # Add the last chunk if not empty
-        if current_chunk:
-            chunks.append({
-                "content": current_chunk,
-                "metadata": {
-                    "chunk_type": self._validate_metadata_value("text"),
-                    "chunk_id": str(uuid.uuid4()),
-                    "chunk_index": len(chunks)
-                }
-            })
+        if current_parts:
+            chunk_metadata = _TEXT_META.copy()
+            chunk_metadata["chunk_id"] = _fast_id()
+            chunk_metadata["chunk_index"] = len(chunks)
+            chunks.append(Chunk(content="\n\n".join(current_parts), metadata=chunk_metadata))
         
         return chunks
 
 class HTMLChunker(BaseChunker):
     """Chunker for HTML content"""
     
-    def _validate_metadata_value(self, value):
-        """Ensure metadata value is a valid type (str, int, float, bool, None)"""
-        if value is None or isinstance(value, (str, int, float, bool)):
-            return value
-        # Convert lists to string
-        elif isinstance(value, list):
-            return ' '.join(str(item) for item in value)
-        # Convert other types to string
-        else:
-            return str(value)
-    
-    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Dict[str, Any]]:
+    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Chunk]:
         """Chunk HTML content by semantic sections while preserving structure"""
-        soup = BeautifulSoup(content, 'html.parser')
+        # Parsed once per call; the tree is passed down to the section helpers
+        soup = BeautifulSoup(content, _HTML_PARSER)
         
         # Extract title and metadata
         title = soup.title.string if soup.title else ""
         
         # Extract metadata from meta tags
         metadata = {
-            "chunk_type": self._validate_metadata_value("html"),
-            "title": self._validate_metadata_value(title),
+            "chunk_type": "html",
+            "title": _validate_metadata_value(title),
         }
         
         for meta in soup.find_all('meta'):
             if meta.get('name') and meta.get('content'):
                 # Ensure metadata values are of valid types (str, int, float, bool, None)
-                content = meta['content']
-                # Try to convert to appropriate type if possible
-                if content.lower() == 'true':
-                    metadata[meta['name']] = True
-                elif content.lower() == 'false':
-                    metadata[meta['name']] = False
-                elif content.isdigit():
-                    metadata[meta['name']] = int(content)
-                elif content.replace('.', '', 1).isdigit() and content.count('.') == 1:
-                    metadata[meta['name']] = float(content)
-                else:
-                    metadata[meta['name']] = self._validate_metadata_value(content)
+                metadata[meta['name']] = _coerce_meta_content(meta['content'])
         
         chunks = []
         
-        # Define semantic section tags
-        section_tags = ['div', 'section', 'article', 'main', 'header', 'footer', 'nav', 'aside']
-        
-        # First try to chunk by semantic sections
-        sections = []
-        for tag in section_tags:
-            sections.extend(soup.find_all(tag))
+        # First try to chunk by semantic sections, in document order with a single tree walk.
+        # Only the outermost sections are kept so nested sections' text is not extracted twice
+        sections = _outermost_sections(soup)
         
         if sections:
             for section in sections:
                 section_text = section.get_text(separator=' ', strip=True)
                 if not section_text:
                     continue
+                
+                # Section attributes are shared by every chunk of this section
+                section_id = _validate_metadata_value(section.get('id', ''))
+                section_class = _validate_metadata_value(section.get('class', ''))
                     
                 # If section is small enough, add it as a chunk
                 if len(section_text) <= chunk_size:
                     section_metadata = metadata.copy()
                     section_metadata.update({
-                        "chunk_id": str(uuid.uuid4()),
+                        "chunk_id": _fast_id(),
                         "chunk_index": len(chunks),
-                        "section_id": self._validate_metadata_value(section.get('id', '')),
-                        "section_class": self._validate_metadata_value(section.get('class', '')),
+                        "section_id": section_id,
+                        "section_class": section_class,
                     })
                     
-                    chunks.append({
-                        "content": section_text,
-                        "metadata": section_metadata
-                    })
+                    chunks.append(Chunk(
+                        content=section_text,
+                        metadata=section_metadata
+                    ))
                 else:
                     # If section is too large, use TextChunker to split it further
                     text_chunker = TextChunker()
                     sub_chunks = text_chunker.chunk(section_text, chunk_size, chunk_overlap)
                     
+                    # Metadata shared by every sub-chunk of this section
+                    sub_chunk_base = metadata.copy()
+                    sub_chunk_base["section_id"] = section_id
+                    sub_chunk_base["section_class"] = section_class
+                    sub_chunk_base["sub_chunk"] = True
+                    
                     # Add HTML metadata to each sub-chunk
-                    for i, sub_chunk in enumerate(sub_chunks):
-                        sub_chunk_metadata = metadata.copy()
-                        sub_chunk_metadata.update({
-                            "chunk_id": str(uuid.uuid4()),
-                            "chunk_index": len(chunks) + i,
-                            "section_id": self._validate_metadata_value(section.get('id', '')),
-                            "section_class": self._validate_metadata_value(section.get('class', '')),
-                            "sub_chunk": True,
-                            "original_chunk_type": self._validate_metadata_value(sub_chunk["metadata"]["chunk_type"])
-                        })
+                    for sub_chunk in sub_chunks:
+                        sub_chunk_metadata = sub_chunk_base.copy()
+                        sub_chunk_metadata["chunk_id"] = _fast_id()
+                        sub_chunk_metadata["chunk_index"] = len(chunks)
+                        # TextChunker chunk types are plain strings
+                        sub_chunk_metadata["original_chunk_type"] = sub_chunk.metadata["chunk_type"]
                         
-                        chunks.append({
-                            "content": sub_chunk["content"],
-                            "metadata": sub_chunk_metadata
-                        })
+                        chunks.append(Chunk(
+                            content=sub_chunk.content,
+                            metadata=sub_chunk_metadata
+                        ))
         else:
             # If no semantic sections found, fall back to TextChunker
             text_content = soup.get_text(separator='\n', strip=True)
@@ -232,55 +349,36 @@ class HTMLChunker(BaseChunker):
             for i, text_chunk in enumerate(text_chunks):
                 chunk_metadata = metadata.copy()
                 chunk_metadata.update({
-                    "chunk_id": str(uuid.uuid4()),
+                    "chunk_id": _fast_id(),
                     "chunk_index": i,
-                    "original_chunk_type": self._validate_metadata_value(text_chunk["metadata"]["chunk_type"])
+                    "original_chunk_type": _validate_metadata_value(text_chunk.metadata["chunk_type"])
                 })
                 
-                chunks.append({
-                    "content": text_chunk["content"],
-                    "metadata": chunk_metadata
-                })
+                chunks.append(Chunk(
+                    content=text_chunk.content,
+                    metadata=chunk_metadata
+                ))
         
         return chunks
 
 class CodeChunker(BaseChunker):
     """Chunker for source code content"""
     
-    def _validate_metadata_value(self, value):
-        """Ensure metadata value is a valid type (str, int, float, bool, None)"""
-        if value is None or isinstance(value, (str, int, float, bool)):
-            return value
-        # Convert lists to string
-        elif isinstance(value, list):
-            return ' '.join(str(item) for item in value)
-        # Convert other types to string
-        else:
-            return str(value)
-    
     def _detect_language(self, content: str) -> str:
         """Detect programming language from content"""
-        # Simple language detection based on file patterns
-        patterns = {
-            r'import\s+[\w\.]+|from\s+[\w\.]+\s+import': 'python',
-            r'function\s+[\w]+\s*\(|const\s+[\w]+\s*=|let\s+[\w]+\s*=|var\s+[\w]+\s*=': 'javascript',
-            r'public\s+class|private\s+class|protected\s+class': 'java',
-            r'#include\s*<|#include\s*"': 'c/c++',
-            r'package\s+[\w\.]+;': 'java',
-            r'using\s+[\w\.]+;': 'c#',
-            r'<!DOCTYPE\s+html|<html': 'html',
-            r'<\?php': 'php',
-        }
-        
-        for pattern, language in patterns.items():
-            if re.search(pattern, content, re.IGNORECASE):
+        # Language signatures appear early, so only probe the head of large files
+        head = content[:_LANGUAGE_PROBE_SIZE]
+        for pattern, language in _LANGUAGE_PATTERNS:
+            if pattern.search(head):
                 return language
         
         return 'unknown'
     
-    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Dict[str, Any]]:
+    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Chunk]:
         """Chunk code by logical sections (functions, classes, etc.)"""
         language = self._detect_language(content)
+        # Shared by every chunk of this document; copied per chunk
+        base_metadata = {"chunk_type": "code", "language": language}
         
         # Split content into lines
         lines = content.split('\n')
@@ -296,17 +394,23 @@ class CodeChunker(BaseChunker):
         imports = []
         
         for i, line in enumerate(lines):
+            line_match = _CODE_LINE_RE.match(line)
+            kind = line_match.lastgroup if line_match else None
+            
             # Detect imports/includes
-            if re.match(r'\s*(import|from|#include|using)\s+', line):
+            if kind == 'imp':
                 imports.append(line)
                 continue
             
             # Check if line starts a function or class
-            starts_function = re.match(r'\s*(def|function|public|private|protected)\s+[\w]+\s*\(', line)
-            starts_class = re.match(r'\s*(class)\s+[\w]+', line)
+            starts_function = kind == 'func'
+            starts_class = kind == 'cls'
             
             # Check for opening/closing braces to track nesting
-            opens = line.count('{') - line.count('}')
+            if '{' in line or '}' in line:
+                opens = line.count('{') - line.count('}')
+            else:
+                opens = 0
             
             # Track function/class depth
             if starts_function:
@@ -328,15 +432,10 @@ class CodeChunker(BaseChunker):
                     # Add the current chunk if not empty
                     if current_chunk:
                         chunk_text = '\n'.join(imports + current_chunk)
-                        chunks.append({
-                            "content": chunk_text,
-                            "metadata": {
-                    "chunk_type": self._validate_metadata_value("code"),
-                    "language": self._validate_metadata_value(language),
-                    "chunk_id": str(uuid.uuid4()),
-                    "chunk_index": len(chunks)
-                }
-                        })
+                        chunk_metadata = base_metadata.copy()
+                        chunk_metadata["chunk_id"] = _fast_id()
+                        chunk_metadata["chunk_index"] = len(chunks)
+                        chunks.append(Chunk(content=chunk_text, metadata=chunk_metadata))
                         current_chunk = []
                         current_size = 0
             
@@ -347,299 +446,247 @@ class CodeChunker(BaseChunker):
             # If chunk is too large and we're not in a function/class, split it
             if current_size > chunk_size and not (in_function or in_class):
                 chunk_text = '\n'.join(imports + current_chunk)
-                chunks.append({
-                    "content": chunk_text,
-                    "metadata": {
-                        "chunk_type": self._validate_metadata_value("code"),
-                        "language": self._validate_metadata_value(language),
-                        "chunk_id": str(uuid.uuid4()),
-                        "chunk_index": len(chunks)
-                    }
-                })
+                chunk_metadata = base_metadata.copy()
+                chunk_metadata["chunk_id"] = _fast_id()
+                chunk_metadata["chunk_index"] = len(chunks)
+                chunks.append(Chunk(content=chunk_text, metadata=chunk_metadata))
                 current_chunk = []
                 current_size = 0
         
         # Add the last chunk if not empty
         if current_chunk:
             chunk_text = '\n'.join(imports + current_chunk)
-            chunks.append({
-                "content": chunk_text,
-                "metadata": {
-                    "chunk_type": self._validate_metadata_value("code"),
-                    "language": self._validate_metadata_value(language),
-                    "chunk_id": str(uuid.uuid4()),
-                    "chunk_index": len(chunks)
-                }
-            })
+            chunk_metadata = base_metadata.copy()
+            chunk_metadata["chunk_id"] = _fast_id()
+            chunk_metadata["chunk_index"] = len(chunks)
+            chunks.append(Chunk(content=chunk_text, metadata=chunk_metadata))
         
         return chunks
 
 class JsonChunker(BaseChunker):
     """Chunker for JSON content"""
     
-    def _validate_metadata_value(self, value):
-        """Ensure metadata value is a valid type (str, int, float, bool, None)"""
-        if value is None or isinstance(value, (str, int, float, bool)):
-            return value
-        # Convert lists to string
-        elif isinstance(value, list):
-            return ' '.join(str(item) for item in value)
-        # Convert other types to string
-        else:
-            return str(value)
-            
-    def _extract_json(self, content: str) -> str:
-        """Extract JSON from content that might be mixed with text"""
+    def _extract_json(self, content: str) -> Tuple[str, Any]:
+        """Extract JSON from content that might be mixed with text
+        
+        Returns:
+            Tuple of the JSON text and its parsed value, or ("", None) if no valid JSON is found
+        """
         # First try the entire content as JSON
         trimmed_content = content.strip()
         try:
             if (trimmed_content.startswith('{') and trimmed_content.endswith('}')) or \
                (trimmed_content.startswith('[') and trimmed_content.endswith(']')):
-                json.loads(trimmed_content)
-                return trimmed_content
+                return trimmed_content, json_loads(trimmed_content)
         except json.JSONDecodeError:
             pass
             
         # Try to find JSON patterns in the content
-        json_pattern = re.compile(r'(\{[\s\S]*?\}|\[[\s\S]*?\])')
-        matches = json_pattern.findall(trimmed_content)
+        matches = _JSON_FRAGMENT_RE.findall(trimmed_content)
         
         for potential_json in matches:
             try:
-                json.loads(potential_json)
-                return potential_json  # Return the first valid JSON found
+                return potential_json, json_loads(potential_json)  # Return the first valid JSON found
             except json.JSONDecodeError:
                 continue
                 
-        return ""  # No valid JSON found
+        return "", None  # No valid JSON found
     
-    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Dict[str, Any]]:
+    def chunk(self, content: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Chunk]:
         """Split JSON content into chunks based on structure and size"""
-        chunks = []
-        
-        # Extract JSON from content if it's mixed with text
-        json_content = self._extract_json(content)
+        # Extract and parse JSON from content if it's mixed with text
+        json_content, json_data = self._extract_json(content)
         if not json_content:
             # If no valid JSON found, fall back to TextChunker
             text_chunker = TextChunker()
             return text_chunker.chunk(content, chunk_size, chunk_overlap)
         
-        try:
-            # Parse JSON content
-            json_data = json.loads(json_content)
-            
-            # Extract metadata if available
-            metadata = {
-                "chunk_type": self._validate_metadata_value("json")
-            }
-            
-            # Handle different JSON structures
-            if isinstance(json_data, dict):
-                # Process dictionary
-                self._process_dict(json_data, chunks, metadata, chunk_size)
-            elif isinstance(json_data, list):
-                # Process list
-                self._process_list(json_data, chunks, metadata, chunk_size)
-            else:
-                # Simple value, just add as a single chunk
-                chunks.append({
-                    "content": content,
-                    "metadata": {
-                        "chunk_type": self._validate_metadata_value("json"),
-                        "chunk_id": str(uuid.uuid4()),
-                        "chunk_index": 0
-                    }
-                })
-        except json.JSONDecodeError:
-            # If JSON parsing fails, fall back to TextChunker
-            text_chunker = TextChunker()
-            return text_chunker.chunk(content, chunk_size, chunk_overlap)
+        return self.chunk_parsed(content, json_data, chunk_size)
+    
+    def chunk_parsed(self, content: str, json_data: Any, chunk_size: int = 1000) -> List[Chunk]:
+        """Split already-parsed JSON into chunks, skipping extraction and parsing"""
+        chunks = []
+        
+        # Extract metadata if available
+        metadata = _JSON_META
+        
+        # Handle different JSON structures
+        if isinstance(json_data, dict):
+            # Process dictionary
+            self._process_dict(json_data, chunks, metadata, chunk_size)
+        elif isinstance(json_data, list):
+            # Process list
+            self._process_list(json_data, chunks, metadata, chunk_size)
+        else:
+            # Simple value, just add as a single chunk
+            chunk_metadata = _JSON_META.copy()
+            chunk_metadata["chunk_id"] = _fast_id()
+            chunk_metadata["chunk_index"] = 0
+            chunks.append(Chunk(content=content, metadata=chunk_metadata))
             
         return chunks
     
-    def _process_dict(self, json_dict: Dict, chunks: List[Dict[str, Any]], base_metadata: Dict[str, Any], chunk_size: int):
+    def _process_dict(self, json_dict: Dict, chunks: List[Chunk], base_metadata: Dict[str, Any], chunk_size: int):
         """Process a dictionary and create chunks"""
-        current_chunk = {}
+        # Serialized '"key":value' members, joined into an object when the chunk is emitted
+        current_chunk: List[str] = []
         current_size = 0
         
         for key, value in json_dict.items():
             # Convert the key-value pair to a string representation
-            item_str = json.dumps({key: value})
-            item_size = len(item_str)
+            member_str = json_dumps(key) + ':' + json_dumps(value)
+            item_size = len(member_str) + 2  # +2 for the braces
             
             if current_size + item_size <= chunk_size:
                 # Add to current chunk
-                current_chunk[key] = value
+                current_chunk.append(member_str)
                 current_size += item_size
             else:
                 # Current chunk is full, add it to chunks
                 if current_chunk:
                     metadata = base_metadata.copy()
-                    metadata.update({
-                        "chunk_id": str(uuid.uuid4()),
-                        "chunk_index": len(chunks)
-                    })
+                    metadata["chunk_id"] = _fast_id()
+                    metadata["chunk_index"] = len(chunks)
                     
-                    chunks.append({
-                        "content": json.dumps(current_chunk),
-                        "metadata": metadata
-                    })
+                    chunks.append(Chunk(
+                        content='{' + ','.join(current_chunk) + '}',
+                        metadata=metadata
+                    ))
                     
                     # Start a new chunk
-                    current_chunk = {key: value}
+                    current_chunk = [member_str]
                     current_size = item_size
                 else:
                     # Item is larger than chunk_size, add it as a separate chunk
                     metadata = base_metadata.copy()
-                    metadata.update({
-                        "chunk_id": str(uuid.uuid4()),
-                        "chunk_index": len(chunks)
-                    })
+                    metadata["chunk_id"] = _fast_id()
+                    metadata["chunk_index"] = len(chunks)
                     
-                    chunks.append({
-                        "content": item_str,
-                        "metadata": metadata
-                    })
+                    chunks.append(Chunk(
+                        content='{' + member_str + '}',
+                        metadata=metadata
+                    ))
         
         # Add the last chunk if not empty
         if current_chunk:
             metadata = base_metadata.copy()
-            metadata.update({
-                "chunk_id": str(uuid.uuid4()),
-                "chunk_index": len(chunks)
-            })
+            metadata["chunk_id"] = _fast_id()
+            metadata["chunk_index"] = len(chunks)
             
-            chunks.append({
-                "content": json.dumps(current_chunk),
-                "metadata": metadata
-            })
+            chunks.append(Chunk(
+                content='{' + ','.join(current_chunk) + '}',
+                metadata=metadata
+            ))
     
-    def _process_list(self, json_list: List, chunks: List[Dict[str, Any]], base_metadata: Dict[str, Any], chunk_size: int):
+    def _process_list(self, json_list: List, chunks: List[Chunk], base_metadata: Dict[str, Any], chunk_size: int):
         """Process a list and create chunks"""
-        current_chunk = []
+        # Serialized items, joined into an array when the chunk is emitted
+        current_chunk: List[str] = []
         current_size = 0
         
         for item in json_list:
             # Convert the item to a string representation
-            item_str = json.dumps(item)
+            item_str = json_dumps(item)
             item_size = len(item_str)
             
             if current_size + item_size <= chunk_size:
                 # Add to current chunk
-                current_chunk.append(item)
+                current_chunk.append(item_str)
                 current_size += item_size
             else:
                 # Current chunk is full, add it to chunks
                 if current_chunk:
                     metadata = base_metadata.copy()
-                    metadata.update({
-                        "chunk_id": str(uuid.uuid4()),
-                        "chunk_index": len(chunks)
-                    })
+                    metadata["chunk_id"] = _fast_id()
+                    metadata["chunk_index"] = len(chunks)
                     
-                    chunks.append({
-                        "content": json.dumps(current_chunk),
-                        "metadata": metadata
-                    })
+                    chunks.append(Chunk(
+                        content='[' + ','.join(current_chunk) + ']',
+                        metadata=metadata
+                    ))
                     
                     # Start a new chunk
-                    current_chunk = [item]
+                    current_chunk = [item_str]
                     current_size = item_size
                 else:
                     # Item is larger than chunk_size, add it as a separate chunk
                     metadata = base_metadata.copy()
-                    metadata.update({
-                        "chunk_id": str(uuid.uuid4()),
-                        "chunk_index": len(chunks)
-                    })
+                    metadata["chunk_id"] = _fast_id()
+                    metadata["chunk_index"] = len(chunks)
                     
-                    chunks.append({
-                        "content": item_str,
-                        "metadata": metadata
-                    })
+                    chunks.append(Chunk(
+                        content=item_str,
+                        metadata=metadata
+                    ))
         
         # Add the last chunk if not empty
         if current_chunk:
             metadata = base_metadata.copy()
-            metadata.update({
-                "chunk_id": str(uuid.uuid4()),
-                "chunk_index": len(chunks)
-            })
+            metadata["chunk_id"] = _fast_id()
+            metadata["chunk_index"] = len(chunks)
             
-            chunks.append({
-                "content": json.dumps(current_chunk),
-                "metadata": metadata
-            })
+            chunks.append(Chunk(
+                content='[' + ','.join(current_chunk) + ']',
+                metadata=metadata
+            ))
 
 class SmartChunker:
     """Smart chunker that detects content type and uses appropriate chunker"""
     
-    def _validate_metadata_value(self, value):
-        """Ensure metadata value is a valid type (str, int, float, bool, None)"""
-        if value is None or isinstance(value, (str, int, float, bool)):
-            return value
-        # Convert lists to string
-        elif isinstance(value, list):
-            return ' '.join(str(item) for item in value)
-        # Convert other types to string
-        else:
-            return str(value)
-    
     def detect_content_type(self, content: str) -> str:
         """Detect content type from the content"""
-        # Check if content is HTML
-        if re.search(r'<!DOCTYPE\s+html|<html|<body|<div|<p>|<head>', content, re.IGNORECASE):
-            return "html"
+        return self._detect_content_type(content)[0]
+    
+    def _detect_content_type(self, content: str) -> Tuple[str, Any]:
+        """Detect content type, also returning the parsed value when the content is JSON"""
+        # Cheap prefix checks decide the common cases without scanning the body
+        head = _HEAD_RE.match(content).group(1).lower()
+        if head.startswith(_HTML_PREFIXES):
+            return "html", None
         
-        # Check if content is JSON
         # Trim whitespace at the beginning and end
         trimmed_content = content.strip()
         
         # Case 1: Pure JSON - Check if content starts with { or [ and ends with } or ]
-        if (trimmed_content.startswith('{') and trimmed_content.endswith('}')) or \
-           (trimmed_content.startswith('[') and trimmed_content.endswith(']')):
+        if (head.startswith('{') and trimmed_content.endswith('}')) or \
+           (head.startswith('[') and trimmed_content.endswith(']')):
             try:
                 # Try to parse as JSON
-                json.loads(trimmed_content)
-                return "json"
+                return "json", json_loads(trimmed_content)
             except json.JSONDecodeError:
                 # Not valid JSON
                 pass
-                
+        
+        # Check if content is HTML
+        if _HTML_RE.search(content):
+            return "html", None
+        
         # Case 2: JSON concatenated with text - Try to find JSON patterns in the content
-        json_pattern = re.compile(r'(\{[\s\S]*?\}|\[[\s\S]*?\])')
-        matches = json_pattern.findall(trimmed_content)
+        matches = _JSON_FRAGMENT_RE.findall(trimmed_content)
         
         for potential_json in matches:
             try:
-                json.loads(potential_json)
-                return "json"  # Found valid JSON within the content
+                return "json", json_loads(potential_json)  # Found valid JSON within the content
             except json.JSONDecodeError:
                 continue  # Try next match
         
         # Check if content is code
-        code_patterns = [
-            r'import\s+[\w\.]+|from\s+[\w\.]+\s+import',  # Python
-            r'function\s+[\w]+\s*\(|const\s+[\w]+\s*=|let\s+[\w]+\s*=',  # JavaScript
-            r'public\s+class|private\s+class|protected\s+class',  # Java
-            r'#include\s*<|#include\s*"',  # C/C++
-            r'package\s+[\w\.]+;',  # Java
-            r'using\s+[\w\.]+;',  # C#
-            r'<\?php',  # PHP
-        ]
-        
-        for pattern in code_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                return "code"
+        folded_content = content.casefold()
+        for keywords, pattern in _CODE_PATTERNS:
+            if any(keyword in folded_content for keyword in keywords) and pattern.search(content):
+                return "code", None
         
         # Default to text
-        return "text"
+        return "text", None
     
-    def chunk(self, content: str, content_type: Optional[str] = None, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Dict[str, Any]]:
+    def chunk(self, content: str, content_type: Optional[str] = None, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Chunk]:
         """Chunk content based on detected or specified type"""
         # Detect content type if not specified
         if not content_type:
-            content_type = self.detect_content_type(content)
+            content_type, json_data = self._detect_content_type(content)
+            if json_data is not None:
+                # Reuse the value parsed during detection instead of parsing again
+                return JsonChunker().chunk_parsed(content, json_data, chunk_size)
         
         # Use appropriate chunker
         if content_type == "html":
@@ -651,4 +698,7 @@ class SmartChunker:
         else:  # Default to text
             chunker = TextChunker()
         
-        return chunker.chunk(content, chunk_size, chunk_overlap)
\ No newline at end of file
+        return chunker.chunk(content, chunk_size, chunk_overlap)
+
+# Create global chunker instance
+smart_chunker = SmartChunker()
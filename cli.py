@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import click
+import csv
 import json
+import sys
 from typing import Optional, List
 from service.chromadb import chroma_service
 from rich.console import Console
@@ -9,6 +11,18 @@ from rich import print as rprint
 
 console = Console()
 
+# Above this many rows, output is streamed as CSV instead of a rich table
+TABLE_ROW_LIMIT = 1000
+CONTENT_PREVIEW = 100
+
+def trim(text: str, limit: int = CONTENT_PREVIEW) -> str:
+    """Shorten text for display, marking truncation with an ellipsis."""
+    return text[:limit] + "..." if len(text) > limit else text
+
+def new_table(title: str) -> Table:
+    """Create a table without per-cell highlighting or row separators."""
+    return Table(title=title, show_lines=False, expand=False, highlight=False)
+
 @click.group()
 def cli():
     """CLI tool untuk manajemen ChromaDB"""
@@ -21,31 +35,37 @@ def cli():
 def list_documents(collection_name: str, limit: int, where: Optional[str]):
     """Menampilkan dokumen dalam collection"""
     try:
-        collection = chroma_service.get_or_create_collection(collection_name)
         where_filter = json.loads(where) if where else None
         
-        # Query documents
-        results = collection.query(
-            query_texts=[""],  # Empty query to get all documents
-            n_results=limit,
-            where=where_filter
+        # Fetch documents by metadata only; no embedding or similarity search needed
+        results = chroma_service.get_documents_by_metadata(
+            collection_name,
+            metadata_filter=where_filter,
+            limit=limit
         )
         
-        if not results['ids'][0]:
+        if not results['ids']:
             console.print(f"[yellow]Tidak ada dokumen dalam collection '{collection_name}'[/yellow]")
             return
         
+        ids, documents, metadatas = results['ids'], results['documents'], results['metadatas']
+        
+        # Stream large listings as CSV; measuring a huge rich table dominates runtime
+        if len(ids) > TABLE_ROW_LIMIT:
+            writer = csv.writer(sys.stdout)
+            writer.writerow(["id", "content", "metadata"])
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                writer.writerow([doc_id, trim(document), json.dumps(metadata)])
+            return
+        
         # Create table
-        table = Table(title=f"Documents in {collection_name}")
+        table = new_table(f"Documents in {collection_name}")
         table.add_column("ID", style="cyan")
-        table.add_column("Content", style="green")
+        table.add_column("Content", style="green", max_width=CONTENT_PREVIEW, overflow="ellipsis")
         table.add_column("Metadata", style="yellow")
         
-        for i in range(len(results['ids'][0])):
-            doc_id = results['ids'][0][i]
-            content = results['documents'][0][i][:100] + "..." if len(results['documents'][0][i]) > 100 else results['documents'][0][i]
-            metadata = json.dumps(results['metadatas'][0][i], indent=2)
-            table.add_row(doc_id, content, metadata)
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            table.add_row(doc_id, trim(document), json.dumps(metadata, indent=2))
         
         console.print(table)
         
@@ -62,7 +82,7 @@ def list_collections():
             console.print("[yellow]Tidak ada collections yang tersedia[/yellow]")
             return
         
-        table = Table(title="Available Collections")
+        table = new_table("Available Collections")
         table.add_column("Collection Name", style="cyan")
         
         for collection in collections:
@@ -92,18 +112,16 @@ def search(collection_name: str, query: str, n_results: int, threshold: float):
             console.print(f"[yellow]Tidak ditemukan dokumen yang sesuai dengan query '{query}'[/yellow]")
             return
         
-        table = Table(title=f"Search Results for '{query}'")
+        table = new_table(f"Search Results for '{query}'")
         table.add_column("ID", style="cyan")
-        table.add_column("Content", style="green")
+        table.add_column("Content", style="green", max_width=CONTENT_PREVIEW, overflow="ellipsis")
         table.add_column("Similarity", style="yellow")
         table.add_column("Metadata", style="magenta")
         
-        for i in range(len(results['ids'])):
-            doc_id = results['ids'][i]
-            content = results['documents'][i][:100] + "..." if len(results['documents'][i]) > 100 else results['documents'][i]
-            similarity = f"{(1 - results['distances'][i]):.2f}"
-            metadata = json.dumps(results['metadatas'][i], indent=2)
-            table.add_row(doc_id, content, similarity, metadata)
+        for doc_id, document, distance, metadata in zip(
+            results['ids'], results['documents'], results['distances'], results['metadatas']
+        ):
+            table.add_row(doc_id, trim(document), f"{(1 - distance):.2f}", json.dumps(metadata, indent=2))
         
         console.print(table)
         
@@ -131,7 +149,7 @@ def delete(collection_name: str, doc_ids: List[str]):
 def delete_collection(collection_name: str):
     """Menghapus collection"""
     try:
-        chroma_service.client.delete_collection(collection_name)
+        chroma_service.delete_collection(collection_name)
         console.print(f"[green]Berhasil menghapus collection '{collection_name}'[/green]")
         
     except Exception as e:
@@ -1,4 +1,4 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 class Settings(BaseSettings):
@@ -14,6 +14,9 @@ class Settings(BaseSettings):
     OPENAI_MODEL_NAME: str = "text-embedding-3-small"
     OPENAI_EMBEDDING_DIM: int = 1536  # 1536 for 3-small/ada-002, 3072 for 3-large
     
+    # Local Embedding Configuration (ChromaDB only)
+    LOCAL_EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"  # ONNX, runs on CPU, 384 dimensions
+    
     # Pinecone Configuration (optional)
     PINECONE_API_KEY: Optional[str] = None
     PINECONE_CLOUD: str = "aws"
@@ -25,10 +28,12 @@ class Settings(BaseSettings):
     DEFAULT_CHUNK_OVERLAP: int = 200
     DEFAULT_SEARCH_RESULTS: int = 5
     DEFAULT_SIMILARITY_THRESHOLD: float = 0.2
+    MAX_REQUEST_SIZE: int = 400 * 1024  # bytes accepted by add_documents
+    INGEST_BATCH_SIZE: int = 250  # chunks per upsert call
+    INGEST_CONCURRENCY: int = 8  # upsert batches in flight at once
+    THREADPOOL_SIZE: int = 64  # concurrent sync request handlers
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 # Create global settings instance
 settings = Settings()
\ No newline at end of file
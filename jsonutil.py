@@ -0,0 +1,38 @@
+import json
+import re
+from typing import Any
+import orjson
+
+# A run of 19+ digits may be an integer that does not fit in 64 bits
+_LONG_DIGITS_RE = re.compile(r'\d{19}')
+
+def json_dumps(value: Any) -> str:
+    """Serialize to compact JSON with orjson, keeping non-ASCII text as-is"""
+    try:
+        return orjson.dumps(value).decode()
+    except TypeError:
+        # orjson rejects a few values json accepts (e.g. integers over 64 bits)
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def _has_float(value: Any) -> bool:
+    """Whether a parsed JSON value contains a float anywhere"""
+    if isinstance(value, float):
+        return True
+    if isinstance(value, dict):
+        return any(_has_float(item) for item in value.values())
+    if isinstance(value, list):
+        return any(_has_float(item) for item in value)
+    return False
+
+def json_loads(content: str) -> Any:
+    """Parse JSON with orjson, returning what json.loads would (raises json.JSONDecodeError)"""
+    try:
+        value = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # orjson rejects NaN, Infinity and out-of-range floats, which json accepts
+        return json.loads(content)
+    # orjson turns integers beyond 64 bits into floats rather than raising; let
+    # json reparse those so they stay exact
+    if _LONG_DIGITS_RE.search(content) and _has_float(value):
+        return json.loads(content)
+    return value
@@ -1,115 +1,188 @@
-from fastapi import FastAPI, HTTPException
-from typing import List
-from models.document import Document, BatchDocumentRequest, SearchRequest
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import logging
+from models.document import (
+    Document, BatchDocumentRequest, SearchRequest,
+    AddDocumentsResponse, MessageResponse, SearchResponse, DocumentsResponse, CollectionsResponse
+)
 from service.rag_factory import get_rag_service
-from chunkers import SmartChunker
+from service.errors import CollectionNotFoundError
+from config import settings
+from chunkers import smart_chunker
+from jsonutil import json_dumps
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-@app.post("/api/add_documents")
-async def add_documents(request: BatchDocumentRequest):
-    try:
-        # Initialize backend service and smart chunker
-        # Validate request size (400 KB limit)
-        request_size = len(request.json().encode('utf-8'))
-        if request_size > 400 * 1024:
-            raise HTTPException(status_code=413, detail="Request payload too large. Maximum allowed size is 400 KB.")
-            
-        service = get_rag_service(request.rag_server, request.embedding_model)
-        smart_chunker = SmartChunker()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync handlers and their blocking backend calls share this thread limiter
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+# Per-chunk metadata that does not describe the chunk's content
+_UNHASHED_KEYS = ('chunk_id', 'chunk_index')
+
+def _canonical_json(value: Dict[str, Any]) -> bytes:
+    return json.dumps(value, sort_keys=True, default=str).encode('utf-8', 'surrogatepass')
+
+def iter_chunks(documents: Iterable[Tuple[str, Document]]) -> Iterator[Dict[str, Any]]:
+    """Smart-chunk each (parent id, document) pair and yield backend-ready chunks.
+    
+    Chunk ids are content-addressed ("<parent id>-<hash>"), so re-sending an
+    unchanged chunk yields the same id. chunk_index is left out of the hash so
+    inserting text early in a document does not change every later id.
+    """
+    for doc_id, doc in documents:
+        # Apply smart chunking
+        chunks = smart_chunker.chunk(
+            content=doc.content,
+            content_type=doc.content_type,
+            chunk_size=doc.chunk_size,
+            chunk_overlap=doc.chunk_overlap
+        )
         
-        # Process each document with smart chunking
-        all_chunks = []
+        # Document-level metadata shared by every chunk of this document,
+        # serialized and hashed once; each chunk continues from a copy of the digest
+        base_metadata = {**doc.metadata, 'parent_document_id': doc_id}
+        base_digest = hashlib.blake2b(_canonical_json(base_metadata), digest_size=16)
+        seen = set()
         
-        for doc in request.documents:
-            # Delete existing chunks for this parent document before re-inserting
-            try:
-                deleted = service.delete_by_parent_id(request.collection_name, str(doc.uid))
-                print(f"Deleted related chunks for parent_document_id={doc.uid}: {deleted}")
-            except Exception as de:
-                print(f"Warning: failed to delete related chunks for parent_document_id={doc.uid}: {de}")
+        for chunk in chunks:
+            digest = base_digest.copy()
+            digest.update(_canonical_json({
+                key: value for key, value in chunk.metadata.items() if key not in _UNHASHED_KEYS
+            }))
+            digest.update(chunk.content.encode('utf-8', 'surrogatepass'))
+            chunk_hash = digest.hexdigest()
             
-            # Apply smart chunking
-            chunks = smart_chunker.chunk(
-                content=doc.content,
-                content_type=doc.content_type,
-                chunk_size=doc.chunk_size,
-                chunk_overlap=doc.chunk_overlap
-            )
+            # Identical chunks within one document are stored once
+            if chunk_hash in seen:
+                continue
+            seen.add(chunk_hash)
             
-            # Process each chunk
-            for chunk in chunks:
-                # Generate a unique ID for each chunk
-                chunk_id = f"{doc.uid}-{chunk['metadata']['chunk_id']}"
-                
-                # Combine document metadata with chunk metadata
-                combined_metadata = doc.metadata.copy()
-                combined_metadata.update(chunk['metadata'])
-                combined_metadata['parent_document_id'] = doc.uid
-                print(combined_metadata)
-                all_chunks.append({
-                    "id": chunk_id,
-                    "content": chunk['content'],
-                    "metadata": combined_metadata
-                })
+            metadata = base_metadata | chunk.metadata
+            metadata['chunk_id'] = chunk_hash
+            yield {
+                "id": f"{doc_id}-{chunk_hash}",
+                "content": chunk.content,
+                "metadata": metadata
+            }
+
+def _payload_too_large() -> HTTPException:
+    limit_kb = settings.MAX_REQUEST_SIZE // 1024
+    return HTTPException(status_code=413, detail=f"Request payload too large. Maximum allowed size is {limit_kb} KB.")
+
+async def parse_batch_request(request: Request) -> BatchDocumentRequest:
+    """Validate the raw request body straight from JSON, skipping the intermediate dict.
+    
+    Oversized payloads are rejected from the Content-Length header before the
+    body is read, and otherwise as soon as the streamed body passes the limit,
+    so a wrong or missing header cannot make the server buffer the full body.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_REQUEST_SIZE:
+        raise _payload_too_large()
+    
+    body = bytearray()
+    async for part in request.stream():
+        body += part
+        if len(body) > settings.MAX_REQUEST_SIZE:
+            raise _payload_too_large()
+    
+    try:
+        return BatchDocumentRequest.model_validate_json(bytes(body))
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+# The body is parsed by a dependency, so describe it for the OpenAPI docs explicitly
+_batch_request_schema = BatchDocumentRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+_batch_request_schema.pop("$defs", None)
+
+@app.post(
+    "/api/add_documents",
+    response_model=AddDocumentsResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _batch_request_schema}}
+        }
+    }
+)
+def add_documents(request: BatchDocumentRequest = Depends(parse_batch_request)):
+    try:
+        # Initialize backend service
+        service = get_rag_service(request.rag_server, request.embedding_model)
+        
+        # Keep only the last document for each uid; earlier ones would be overwritten anyway
+        documents = list({doc.uid: doc for doc in request.documents}.values())
+        if len(documents) != len(request.documents):
+            logger.info("Dropped %d documents with duplicate uid", len(request.documents) - len(documents))
+        
+        # Find the chunks already stored for these documents, with their stored position.
+        # A failure aborts the request: without it stale chunks could not be removed
+        parent_ids = [str(doc.uid) for doc in documents]
+        existing = service.get_chunk_indexes(request.collection_name, parent_ids)
+        
+        # Only chunks that are not already stored at the same position get upserted;
+        # a moved chunk keeps its id but must be rewritten with its new chunk_index.
+        # A stored position of None means the backend does not keep positions
+        chunk_ids = []
+        def new_chunks():
+            for chunk in iter_chunks((doc.uid, doc) for doc in documents):
+                chunk_ids.append(chunk["id"])
+                if chunk["id"] not in existing:
+                    yield chunk
+                elif existing[chunk["id"]] not in (None, chunk["metadata"].get("chunk_index")):
+                    yield chunk
+        
+        # Chunks are produced lazily and upserted batch by batch
+        added_ids = service.add_documents(request.collection_name, new_chunks(), batch_size=request.batch_size)
+        
+        # Remove chunks that no longer belong to the documents
+        stale_ids = existing.keys() - set(chunk_ids)
+        if stale_ids:
+            service.delete_documents(request.collection_name, list(stale_ids))
         
-        # Add chunks to selected RAG backend
-        if all_chunks:
-            chunk_ids = service.add_documents(request.collection_name, all_chunks)
-            return {"ids": chunk_ids, "message": f"Documents processed and {len(all_chunks)} chunks added successfully"}
+        if chunk_ids:
+            return {
+                "ids": chunk_ids,
+                "message": f"Documents processed: {len(added_ids)} chunks added, "
+                           f"{len(chunk_ids) - len(added_ids)} unchanged, {len(stale_ids)} removed"
+            }
         
         return {"ids": [], "message": "No documents to process"}
     except Exception as e:
-        print(f"Error processing documents: {str(e)}")
+        logger.error("Error processing documents: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.put("/api/update_documents/{collection_name}")
-async def update_documents(collection_name: str, documents: List[Document], doc_ids: List[str]):
+@app.put("/api/update_documents/{collection_name}", response_model=MessageResponse)
+def update_documents(collection_name: str, documents: List[Document], doc_ids: List[str]):
     try:
         if len(documents) != len(doc_ids):
             raise HTTPException(status_code=400, detail="Number of documents must match number of IDs")
         
-        # Initialize smart chunker
-        smart_chunker = SmartChunker()
-        
-        # Process each document with smart chunking
-        all_chunks = []
-        
-        for i, doc in enumerate(documents):
-            # Apply smart chunking
-            chunks = smart_chunker.chunk(
-                content=doc.content,
-                content_type=doc.content_type,
-                chunk_size=doc.chunk_size,
-                chunk_overlap=doc.chunk_overlap
-            )
-            
-            # Process each chunk
-            for chunk in chunks:
-                # Generate a unique ID for each chunk
-                chunk_id = f"{doc_ids[i]}-{chunk['metadata']['chunk_id']}"
-                
-                # Combine document metadata with chunk metadata
-                combined_metadata = doc.metadata.copy()
-                combined_metadata.update(chunk['metadata'])
-                combined_metadata['parent_document_id'] = doc_ids[i]
-                
-                all_chunks.append({
-                    "id": chunk_id,
-                    "content": chunk['content'],
-                    "metadata": combined_metadata
-                })
-        
         # Update documents in selected RAG backend
         service = get_rag_service(None, None)
-        chunks_updated = service.update_documents(collection_name, doc_ids, all_chunks)
+        chunks = iter_chunks(zip(doc_ids, documents))
+        chunks_updated = service.update_documents(collection_name, doc_ids, chunks)
         return {"message": f"Documents updated successfully with {chunks_updated} new chunks"}
     except Exception as e:
-        print(f"Error processing documents: {str(e)}")
+        logger.error("Error processing documents: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/api/delete_documents/{collection_name}")
-async def delete_documents(collection_name: str, doc_ids: List[str]):
+@app.delete("/api/delete_documents/{collection_name}", response_model=MessageResponse)
+def delete_documents(collection_name: str, doc_ids: List[str]):
     try:
         service = get_rag_service(None, None)
         service.delete_documents(collection_name, doc_ids)
@@ -117,8 +190,8 @@ async def delete_documents(collection_name: str, doc_ids: List[str]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/search_similarity")
-async def search_similarity(request: SearchRequest):
+@app.post("/api/search_similarity", response_model=SearchResponse)
+def search_similarity(request: SearchRequest):
     try:
         service = get_rag_service(request.rag_server, request.embedding_model)
         results = service.search_similarity(
@@ -130,11 +203,62 @@ async def search_similarity(request: SearchRequest):
         )
         return results
     except Exception as e:
-        print(f"Error processing search similarity: {str(e)}")
+        logger.error("Error processing search similarity: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _ndjson_line(value: Dict[str, Any]) -> bytes:
+    """Serialize one value as a newline-terminated JSON line."""
+    return (json_dumps(value) + "\n").encode('utf-8')
+
+@app.post("/api/search_similarity/stream")
+def search_similarity_stream(request: SearchRequest):
+    """Search like /api/search_similarity, streaming one NDJSON line per hit."""
+    try:
+        service = get_rag_service(request.rag_server, request.embedding_model)
+        results = service.search_similarity(
+            collection_name=request.collection_name,
+            query=request.query,
+            n_results=request.n_results,
+            threshold=request.threshold,
+            where=request.where
+        )
+    except Exception as e:
+        logger.error("Error processing search similarity: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    def generate() -> Iterator[bytes]:
+        for doc_id, distance, document, metadata in zip(
+            results['ids'], results['distances'], results['documents'], results['metadatas']
+        ):
+            yield _ndjson_line({"id": doc_id, "distance": distance, "document": document, "metadata": metadata})
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/api/documents/{collection_name}", response_model=DocumentsResponse)
+def list_documents(
+    collection_name: str,
+    limit: int = 100,
+    where: Optional[str] = None,
+    rag_server: Optional[str] = None
+):
+    where_filter = None
+    if where:
+        try:
+            where_filter = json.loads(where)
+        except ValueError:
+            pass
+        if not isinstance(where_filter, dict):
+            raise HTTPException(status_code=400, detail="where must be a JSON object")
+    try:
+        service = get_rag_service(rag_server, None)
+        return service.get_documents_by_metadata(collection_name, where_filter, limit=limit)
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/collections")
-async def list_collections():
+@app.get("/api/collections", response_model=CollectionsResponse)
+def list_collections():
     try:
         service = get_rag_service(None, None)
         collections = service.list_collections()
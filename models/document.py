@@ -1,33 +1,35 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Dict, Any
-from chunkers import SmartChunker
 from config import settings
 
 class Document(BaseModel):
     uid: str
     content: str
     metadata: dict = Field(default_factory=dict)
+    # Left unset when not sent: SmartChunker detects the type while chunking,
+    # reusing the parsed value for JSON instead of parsing it twice
     content_type: Optional[str] = None
-    chunk_size: int = settings.DEFAULT_CHUNK_SIZE
-    chunk_overlap: int = settings.DEFAULT_CHUNK_OVERLAP
+    chunk_size: int = Field(default=settings.DEFAULT_CHUNK_SIZE, gt=0)
+    chunk_overlap: int = Field(default=settings.DEFAULT_CHUNK_OVERLAP, ge=0)
     
-    @validator('content_type', pre=True, always=True)
-    def verify_content_type(cls, content_type, values):
-        if content_type is not None:
-            return content_type
-        
-        if 'content' in values and values['content']:
-            smart_chunker = SmartChunker()
-            detected_type = smart_chunker.detect_content_type(values['content'])
-            return detected_type
-        
-        return "text"
+    @model_validator(mode='after')
+    def check_chunk_overlap(self):
+        if self.chunk_overlap >= self.chunk_size:
+            if 'chunk_overlap' in self.model_fields_set:
+                raise ValueError("chunk_overlap must be smaller than chunk_size")
+            # Only chunk_size was sent: scale the default overlap to it
+            self.chunk_overlap = min(
+                self.chunk_size * settings.DEFAULT_CHUNK_OVERLAP // settings.DEFAULT_CHUNK_SIZE,
+                self.chunk_size - 1
+            )
+        return self
 
 class BatchDocumentRequest(BaseModel):
     documents: List[Document]
     collection_name: str
     embedding_model: Optional[str] = None
     rag_server: Optional[str] = settings.RAG_SERVER
+    batch_size: int = Field(default=settings.INGEST_BATCH_SIZE, gt=0)
 
 class SearchRequest(BaseModel):
     query: str
@@ -36,4 +38,25 @@ class SearchRequest(BaseModel):
     threshold: float = settings.DEFAULT_SIMILARITY_THRESHOLD
     embedding_model: Optional[str] = None
     rag_server: Optional[str] = settings.RAG_SERVER
-    where: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    where: Optional[Dict[str, Any]] = None
+
+class AddDocumentsResponse(BaseModel):
+    ids: List[str]
+    message: str
+
+class MessageResponse(BaseModel):
+    message: str
+
+class SearchResponse(BaseModel):
+    ids: List[str]
+    distances: List[float]
+    metadatas: List[Optional[Dict[str, Any]]]
+    documents: List[Optional[str]]
+
+class DocumentsResponse(BaseModel):
+    ids: List[str]
+    metadatas: List[Optional[Dict[str, Any]]]
+    documents: List[Optional[str]]
+
+class CollectionsResponse(BaseModel):
+    collections: List[str]
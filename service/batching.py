@@ -0,0 +1,48 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Iterable, List
+from config import settings
+
+# Shared pool bounding the number of upsert batches in flight across all requests
+_executor = ThreadPoolExecutor(max_workers=settings.INGEST_CONCURRENCY, thread_name_prefix="ingest")
+
+def map_batches(
+    fn: Callable[[List[Any]], List[Any]],
+    items: Iterable[Any],
+    batch_size: int,
+    concurrency: int = settings.INGEST_CONCURRENCY
+) -> List[Any]:
+    """Call fn on successive batches of items and concatenate the results in order.
+
+    Up to ``concurrency`` batches run at once; items are pulled lazily, so at most
+    that many batches are held in memory.
+    """
+    items = iter(items)
+    results: List[Any] = []
+
+    if concurrency <= 1:
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                return results
+            results.extend(fn(batch))
+
+    pending = deque()
+    try:
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+            if len(pending) >= concurrency:
+                results.extend(pending.popleft().result())
+            pending.append(_executor.submit(fn, batch))
+
+        while pending:
+            results.extend(pending.popleft().result())
+    finally:
+        # On failure, drop batches that have not started yet
+        for future in pending:
+            future.cancel()
+
+    return results
@@ -1,124 +1,243 @@
-from typing import List, Dict, Any, Optional
+import functools
+import threading
+from typing import Callable, List, Dict, Any, Iterable, Optional
 import chromadb
+import chromadb.errors
 from chromadb.utils import embedding_functions
 from config import settings
+from service.batching import map_batches
+from service.errors import CollectionNotFoundError
+
+# Raised for an operation on a collection id that no longer exists; the name
+# differs across chromadb releases
+_NOT_FOUND_ERRORS = tuple(
+    getattr(chromadb.errors, name)
+    for name in ("NotFoundError", "InvalidCollectionException")
+    if hasattr(chromadb.errors, name)
+)
+
+@functools.lru_cache(maxsize=None)
+def get_client(host: str = settings.CHROMA_HOST, port: int = settings.CHROMA_PORT):
+    """Return the shared Chroma HTTP client for a server, so its connection pool is reused."""
+    return chromadb.HttpClient(
+        host=host,
+        port=port,
+        settings=chromadb.config.Settings(
+            anonymized_telemetry=False
+        )
+    )
+
+@functools.lru_cache(maxsize=8)
+def get_embedding_function(model_name: str):
+    """Return the shared embedding function for a model, so its client (or ONNX session) is reused."""
+    if model_name == settings.LOCAL_EMBEDDING_MODEL:
+        # Embed in-process with the ONNX MiniLM model instead of calling OpenAI
+        return embedding_functions.ONNXMiniLM_L6_V2(
+            preferred_providers=["CPUExecutionProvider"]
+        )
+    return embedding_functions.OpenAIEmbeddingFunction(
+        api_key=settings.OPENAI_API_KEY,
+        model_name=model_name
+    )
 
 class ChromaDBService:
     def __init__(self, embedding_model=None):
-        self.client = chromadb.HttpClient(
-            host=settings.CHROMA_HOST,
-            port=settings.CHROMA_PORT,
-            settings=chromadb.config.Settings(
-                anonymized_telemetry=False
-            )
-        )
+        self.client = get_client(settings.CHROMA_HOST, settings.CHROMA_PORT)
+        self._max_batch_size: Optional[int] = None
+        self._collections: Dict[str, Any] = {}
+        self._collections_lock = threading.Lock()
         self.embedding_function = None
-        if settings.OPENAI_API_KEY and embedding_model:
-            self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-                api_key=settings.OPENAI_API_KEY,
-                model_name=embedding_model or settings.OPENAI_MODEL_NAME
-            )
+        if embedding_model == settings.LOCAL_EMBEDDING_MODEL or (settings.OPENAI_API_KEY and embedding_model):
+            self.embedding_function = get_embedding_function(embedding_model)
     
     def get_or_create_collection(self, name: str):
-        """Get an existing collection or create a new one if it doesn't exist."""
+        """Get an existing collection or create a new one if it doesn't exist.
+        
+        Collection handles are cached per service so each request does not pay
+        a round trip to the server just to resolve the collection.
+        """
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+        
+        with self._collections_lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                if name not in ["help-article"]:
+                    collection = self.client.get_or_create_collection(
+                        name=name,
+                        embedding_function=self.embedding_function
+                    )
+                else:
+                    collection = self.client.get_collection(
+                        name=name,
+                    )
+                self._collections[name] = collection
+        return collection
+    
+    def get_collection(self, name: str):
+        """Get an existing collection without creating it.
+        
+        Raises CollectionNotFoundError if the collection does not exist.
+        """
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+        
         try:
             if name not in ["help-article"]:
-                return self.client.get_collection(
+                collection = self.client.get_collection(
                     name=name,
                     embedding_function=self.embedding_function
                 )
             else:
-                return self.client.get_collection(
+                collection = self.client.get_collection(
                     name=name,
                 )
-        except:
-            return self.client.create_collection(
-                name=name,
-                embedding_function=self.embedding_function
-            )
+        except _NOT_FOUND_ERRORS + (ValueError,):
+            # Older chromadb releases raise ValueError for a missing collection
+            raise CollectionNotFoundError(name)
+        
+        with self._collections_lock:
+            return self._collections.setdefault(name, collection)
     
-    def add_documents(self, collection_name: str, chunks: List[Dict[str, Any]]) -> List[str]:
-        """Add document chunks to a collection."""
-        collection = self.get_or_create_collection(collection_name)
+    def _with_collection(self, name: str, fn: Callable[[Any], Any], create: bool = True) -> Any:
+        """Call fn with the collection's handle, re-resolving the name once if it went stale.
         
-        chunk_ids = [chunk["id"] for chunk in chunks]
-        chunk_contents = [chunk["content"] for chunk in chunks]
-        chunk_metadatas = [chunk["metadata"] for chunk in chunks]
+        A collection deleted (and possibly recreated) by another process, such as
+        cli.py, leaves a cached handle pointing at an id that no longer exists.
+        With create=False a missing collection raises CollectionNotFoundError.
+        """
+        resolve = self.get_or_create_collection if create else self.get_collection
+        collection = resolve(name)
+        try:
+            return fn(collection)
+        except _NOT_FOUND_ERRORS:
+            with self._collections_lock:
+                if self._collections.get(name) is collection:
+                    del self._collections[name]
+            return fn(resolve(name))
+    
+    def delete_collection(self, name: str) -> None:
+        """Delete a collection and drop its cached handle."""
+        with self._collections_lock:
+            self._collections.pop(name, None)
+            self.client.delete_collection(name)
+    
+    def _batch_size(self, batch_size: int) -> int:
+        """Cap the requested batch size at the server's maximum batch size."""
+        if self._max_batch_size is None:
+            self._max_batch_size = self.client.get_max_batch_size()
+        return max(1, min(batch_size, self._max_batch_size))
+    
+    def _upsert_chunks(self, collection_name: str, chunks: Iterable[Dict[str, Any]], batch_size: int) -> List[str]:
+        """Upsert chunks in batches so no single request exceeds the batch limit.
         
-        collection.upsert(
-            documents=chunk_contents,
-            metadatas=chunk_metadatas,
-            ids=chunk_ids
-        )
+        Chunks are consumed lazily, so a generator is never fully materialized,
+        and up to INGEST_CONCURRENCY batches are upserted concurrently.
+        """
+        def upsert(batch: List[Dict[str, Any]]) -> List[str]:
+            batch_ids = [chunk["id"] for chunk in batch]
+            self._with_collection(collection_name, lambda collection: collection.upsert(
+                documents=[chunk["content"] for chunk in batch],
+                metadatas=[chunk["metadata"] for chunk in batch],
+                ids=batch_ids
+            ))
+            return batch_ids
         
-        return chunk_ids
+        return map_batches(upsert, chunks, self._batch_size(batch_size))
     
-    def update_documents(self, collection_name: str, doc_ids: List[str], chunks: List[Dict[str, Any]]) -> int:
+    def add_documents(
+        self,
+        collection_name: str,
+        chunks: Iterable[Dict[str, Any]],
+        batch_size: int = settings.INGEST_BATCH_SIZE
+    ) -> List[str]:
+        """Add document chunks to a collection."""
+        return self._upsert_chunks(collection_name, chunks, batch_size)
+    
+    def delete_by_parent_ids(self, collection_name: str, parent_ids: List[str]) -> None:
+        """Delete every chunk belonging to any of the given parent documents."""
+        if not parent_ids:
+            return
+        self._with_collection(collection_name, lambda collection: collection.delete(
+            where={"parent_document_id": {"$in": list(parent_ids)}}
+        ))
+    
+    def get_chunk_indexes(self, collection_name: str, parent_ids: List[str]) -> Dict[str, Any]:
+        """Return the stored chunk_index of every chunk of the given parent documents, keyed by chunk id."""
+        if not parent_ids:
+            return {}
+        results = self._with_collection(collection_name, lambda collection: collection.get(
+            where={"parent_document_id": {"$in": list(parent_ids)}},
+            include=["metadatas"]
+        ))
+        return {
+            chunk_id: (metadata or {}).get("chunk_index")
+            for chunk_id, metadata in zip(results['ids'], results['metadatas'])
+        }
+    
+    def update_documents(self, collection_name: str, doc_ids: List[str], chunks: Iterable[Dict[str, Any]]) -> int:
         """Update documents in a collection."""
-        collection = self.get_or_create_collection(collection_name)
-        
-        # Delete existing chunks for these documents
-        for doc_id in doc_ids:
-            try:
-                results = collection.query(
-                    query_texts=[""],
-                    where={"parent_document_id": doc_id},
-                    n_results=100
-                )
-                if results and results['ids'] and results['ids'][0]:
-                    collection.delete(ids=results['ids'][0])
-            except Exception as e:
-                print(f"Error finding chunks for document {doc_id}: {str(e)}")
+        # Delete existing chunks for these documents with one metadata-only call
+        self.delete_by_parent_ids(collection_name, doc_ids)
         
         # Add new chunks
-        chunk_ids = [chunk["id"] for chunk in chunks]
-        chunk_contents = [chunk["content"] for chunk in chunks]
-        chunk_metadatas = [chunk["metadata"] for chunk in chunks]
-        
-        collection.add(
-            documents=chunk_contents,
-            metadatas=chunk_metadatas,
-            ids=chunk_ids
-        )
-        
-        return len(chunks)
+        return len(self._upsert_chunks(collection_name, chunks, settings.INGEST_BATCH_SIZE))
     
     def delete_documents(self, collection_name: str, doc_ids: List[str]) -> None:
         """Delete documents from a collection."""
-        collection = self.get_or_create_collection(collection_name)
-        collection.delete(ids=doc_ids)
+        self._with_collection(collection_name, lambda collection: collection.delete(ids=doc_ids))
     
     def search_similarity(
         self,
         collection_name: str,
         query: str,
         n_results: int = settings.DEFAULT_SEARCH_RESULTS,
-        threshold: float = settings.DEFAULT_SIMILARITY_THRESHOLD
+        threshold: float = settings.DEFAULT_SIMILARITY_THRESHOLD,
+        where: Optional[Dict[str, Any]] = None
     ) -> Dict[str, List]:
-        """Search for similar documents in a collection."""
-        collection = self.get_or_create_collection(collection_name)
+        """Search for similar documents in a collection.
         
-        results = collection.query(
+        Metadata filters are applied by Chroma itself. The threshold is not
+        applied here: collections use Chroma's default L2 distance, so
+        ``1 - distance`` is not a similarity score.
+        """
+        results = self._with_collection(collection_name, lambda collection: collection.query(
             query_texts=[query],
-            n_results=n_results
-        )
+            n_results=n_results,
+            where=where or None,
+            include=["documents", "metadatas", "distances"]
+        ))
         
-        filtered_results = {
-            'ids': [],
-            'distances': [],
-            'metadatas': [],
-            'documents': []
+        return {
+            'ids': results['ids'][0],
+            'distances': results['distances'][0],
+            'metadatas': results['metadatas'][0],
+            'documents': results['documents'][0]
         }
+    
+    def get_documents_by_metadata(
+        self,
+        collection_name: str,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        limit: int = 100
+    ) -> Dict[str, List]:
+        """Retrieve documents matching a metadata filter without running a similarity query.
         
-        for i, distance in enumerate(results['distances'][0]):
-            # if 1 - distance >= threshold:
-            if True:
-                filtered_results['ids'].append(results['ids'][0][i])
-                filtered_results['distances'].append(results['distances'][0][i])
-                filtered_results['metadatas'].append(results['metadatas'][0][i])
-                filtered_results['documents'].append(results['documents'][0][i])
+        Raises CollectionNotFoundError instead of creating a missing collection.
+        """
+        results = self._with_collection(collection_name, lambda collection: collection.get(
+            where=metadata_filter or None,
+            limit=limit,
+            include=["documents", "metadatas"]
+        ), create=False)
         
-        return filtered_results
+        return {
+            'ids': results['ids'],
+            'metadatas': results['metadatas'],
+            'documents': results['documents']
+        }
     
     def list_collections(self) -> List[str]:
         """List all available collections."""
@@ -0,0 +1,6 @@
+class CollectionNotFoundError(LookupError):
+    """Raised when a read-only operation names a collection that does not exist."""
+    
+    def __init__(self, name: str):
+        super().__init__(f"Collection '{name}' does not exist")
+        self.name = name
@@ -1,126 +1,232 @@
-import json
+import functools
+import logging
+import math
+import random
+import re
+import threading
 import time
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from pinecone import Pinecone, ServerlessSpec
+from pinecone.exceptions import PineconeException
 from config import settings
+from jsonutil import json_dumps
+from service.batching import map_batches
+from service.errors import CollectionNotFoundError
 from openai import OpenAI
 
 
+def _flatten_value(value: Any) -> Any:
+    """Convert a metadata value to a type Pinecone accepts as record metadata."""
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        # Lists of strings are native Pinecone metadata and stay filterable with $in
+        return value
+    if isinstance(value, (dict, list)):
+        return json_dumps(value)
+    return str(value)
+
+
+# Chunk id suffix after "<parent id>-": a content hash, or a uuid4 from older releases
+_CHUNK_SUFFIX_RE = re.compile(
+    r'[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+)
+
+
+def _page_ids(page) -> List[str]:
+    """Return the vector ids in a page yielded by Index.list().
+
+    Older SDKs yield lists of id strings, newer ones yield ListResponse pages.
+    """
+    items = page.vectors if hasattr(page, "vectors") else page
+    return [getattr(item, "id", item) for item in items]
+
+
+logger = logging.getLogger(__name__)
+
+# Attempts made for a request that Pinecone rate-limits (HTTP 429)
+_MAX_ATTEMPTS = 5
+
+
+def _with_backoff(fn, *args, **kwargs):
+    """Call fn, retrying with exponential backoff and jitter while Pinecone answers 429."""
+    for attempt in range(_MAX_ATTEMPTS):
+        try:
+            return fn(*args, **kwargs)
+        except PineconeException as e:
+            # Newer SDKs raise RateLimitError (status_code), older ones PineconeApiException (status)
+            status = getattr(e, "status_code", None) or getattr(e, "status", None)
+            if status != 429 or attempt == _MAX_ATTEMPTS - 1:
+                raise
+            delay = min(32, 2 ** attempt + random.random())
+            logger.warning("[Pinecone] Rate limited, retrying in %.1f s", delay)
+            time.sleep(delay)
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(api_key: str) -> Pinecone:
+    """Return the shared Pinecone client for an API key, so its connection pool is reused."""
+    return Pinecone(api_key=api_key)
+
+
 class PineconeService:
     """Service wrapper for Pinecone to match the ChromaDBService interface."""
 
     def __init__(self, embedding_model: Optional[str] = None):
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY) if settings.PINECONE_API_KEY else None
+        self.pc = get_client(settings.PINECONE_API_KEY) if settings.PINECONE_API_KEY else None
         self.embedding_model = embedding_model or settings.OPENAI_MODEL_NAME
-        self._index_cache: Dict[str, Dict[str, Any]] = {}
+        # index name -> [Index handle, monotonic expiry time, hits], oldest entry first
+        self._index_cache: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._index_cache_lock = threading.Lock()
+        self._index_cache_size = 128
         self._cache_expiry_hours = 2
+        # (monotonic expiry time, index names) from the last list_indexes() call
+        self._list_cache: Optional[Tuple[float, List[str]]] = None
+        self._list_cache_ttl = 60
 
-    def _index_name(self, name: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _index_name(name: str) -> str:
+        """Map a collection name to its Pinecone index name, memoized per name."""
         name = name.replace("_", "-")
         prefix = settings.PINECONE_INDEX_PREFIX
         return f"{prefix}-{name}" if prefix else name
 
-    def _is_cache_expired(self, index_name: str) -> bool:
-        """Check if cached index has expired (older than 2 hours)."""
-        if index_name not in self._index_cache:
-            return True
-        
-        cache_entry = self._index_cache[index_name]
-        cached_time = cache_entry.get('timestamp', 0)
-        current_time = time.time()
-        expiry_seconds = self._cache_expiry_hours * 3600  # Convert hours to seconds
-        
-        return (current_time - cached_time) > expiry_seconds
-
-    def _clear_expired_cache(self, index_name: str) -> None:
-        """Remove expired cache entry."""
-        if index_name in self._index_cache:
-            del self._index_cache[index_name]
+    def _get_or_create_index(self, name: str, create: bool = True):
+        """Get the handle for a collection's index, creating the index if it doesn't exist.
 
-    def _get_or_create_index(self, name: str):
+        With create=False a missing index raises CollectionNotFoundError instead. Handles are cached for a limited time in a bounded map, so warm calls
+        make no control-plane round trip. See _index_ttl for how long.
+        """
         if not self.pc:
             raise Exception("Pinecone API key not configured")
         index_name = self._index_name(name)
-        
-        # Check if cache exists and is not expired
-        if index_name in self._index_cache and not self._is_cache_expired(index_name):
-            return self._index_cache[index_name]['index']
-        
-        # Clear expired cache if it exists
-        if self._is_cache_expired(index_name):
-            self._clear_expired_cache(index_name)
-
-        if not self.pc.has_index(index_name):
-            self.pc.create_index_for_model(
-                name=index_name,
-                cloud="aws",
-                region="us-east-1",
-                embed={
-                    "model": self.embedding_model,
-                    "field_map":{"text": "content"}
-                }
-            )
 
-        index = self.pc.Index(index_name)
-        # Store index with timestamp for expiry tracking
-        self._index_cache[index_name] = {
-            'index': index,
-            'timestamp': time.time()
-        }
+        entry = self._index_cache.get(index_name)
+        if entry is not None and entry[1] > time.monotonic():
+            entry[2] += 1
+            return entry[0]
+
+        with self._index_cache_lock:
+            # Another thread may have resolved the index while we waited
+            entry = self._index_cache.get(index_name)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            hits = entry[2] if entry is not None else 0
+
+            if not self.pc.has_index(index_name):
+                if not create:
+                    raise CollectionNotFoundError(name)
+                self.pc.create_index_for_model(
+                    name=index_name,
+                    cloud="aws",
+                    region="us-east-1",
+                    embed={
+                        "model": self.embedding_model,
+                        "field_map":{"text": "content"}
+                    }
+                )
+                self._list_cache = None
+
+            index = self.pc.Index(index_name)
+            self._index_cache[index_name] = [index, time.monotonic() + self._index_ttl(hits), 0]
+            self._index_cache.move_to_end(index_name)
+            while len(self._index_cache) > self._index_cache_size:
+                self._index_cache.popitem(last=False)
         return index
 
+    def _index_ttl(self, hits: int) -> float:
+        """Seconds to cache an index handle whose previous entry was hit ``hits`` times.
+
+        Hot indexes are cached up to 4x the base expiry; once the cache is more
+        than 70% full, new entries expire proportionally sooner.
+        """
+        ttl = self._cache_expiry_hours * 3600 * min(4.0, max(1.0, math.log2(hits + 1)))
+        pressure = len(self._index_cache) / self._index_cache_size
+        if pressure > 0.7:
+            ttl *= max(0.1, 1 - pressure)
+        return ttl
+
     def get_or_create_collection(self, name: str):
         return self._get_or_create_index(name)
 
-    def flatten_metadata(self, metadata):
-        for key, value in metadata.items():
-            if isinstance(value, (dict, list)):
-                metadata[key] = json.dumps(value)
-            elif not isinstance(value, (str, int, float, bool)):
-                metadata[key] = str(value)
-        print("flatten_metadata:", metadata)
-        return metadata
+    def flatten_metadata(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of metadata with every value converted to a Pinecone metadata type."""
+        return {key: _flatten_value(value) for key, value in metadata.items()}
 
-    def add_documents(self, collection_name: str, chunks: List[Dict[str, Any]]) -> List[str]:
+    def add_documents(
+        self,
+        collection_name: str,
+        chunks: Iterable[Dict[str, Any]],
+        batch_size: int = settings.INGEST_BATCH_SIZE
+    ) -> List[str]:
         index = self._get_or_create_index(collection_name)
-        ids = [chunk["id"] for chunk in chunks]
-        docs = [chunk["content"] for chunk in chunks]
-        metas = [chunk["metadata"] for chunk in chunks]
-
-        vectors = []
-        for i, vid in enumerate(ids):
-            meta = metas[i].copy() if metas[i] else {}
-            meta["content"] = docs[i]
-            vectors.append({"id": vid, "content": docs[i], **self.flatten_metadata(meta)})
         
-        index.upsert_records("default-namespace", vectors)
-        return ids
+        def upsert(batch: List[Dict[str, Any]]) -> List[str]:
+            # chunk_index is not stored: unchanged chunks are skipped by id alone
+            # (see get_chunk_indexes), so a stored position would go stale when
+            # earlier chunks of the document move
+            vectors = [
+                {
+                    **self.flatten_metadata({
+                        key: value for key, value in (chunk["metadata"] or {}).items() if key != "chunk_index"
+                    }),
+                    "id": chunk["id"],
+                    "content": chunk["content"]
+                }
+                for chunk in batch
+            ]
+            
+            _with_backoff(index.upsert_records, namespace="default-namespace", records=vectors)
+            return [vector["id"] for vector in vectors]
+        
+        # Integrated-embedding upserts accept at most 96 records per call
+        return map_batches(upsert, chunks, max(1, min(batch_size, 96)))
 
     def delete_by_parent_id(self, collection_name: str, parent_id: str) -> None:
+        self.delete_by_parent_ids(collection_name, [parent_id])
+
+    def delete_by_parent_ids(self, collection_name: str, parent_ids: List[str]) -> None:
+        if not parent_ids:
+            return
         index = self._get_or_create_index(collection_name)
-        index.delete(
+        _with_backoff(
+            index.delete,
             namespace='default-namespace',
             filter={
-                "parent_document_id": {"$eq": parent_id}
+                "parent_document_id": {"$in": list(parent_ids)}
             }
         )
 
-    def update_documents(self, collection_name: str, doc_ids: List[str], chunks: List[Dict[str, Any]]) -> int:
+    def get_chunk_indexes(self, collection_name: str, parent_ids: List[str]) -> Dict[str, Any]:
+        """Return the ids of every chunk of the given parent documents, mapped to None.
+
+        Records do not store chunk_index (see add_documents), so positions are
+        unknown. Ids are listed by "<parent id>-" prefix, which returns ids only,
+        and the suffix must be a chunk hash or a legacy uuid4 so chunks of
+        parents named "<parent id>-..." are not picked up.
+        """
         index = self._get_or_create_index(collection_name)
-        # Delete by filter (parent_document_id)
-        for doc_id in doc_ids:
-            try:
-                index.delete(filter={"parent_document_id": doc_id})
-            except Exception:
-                pass
+        chunk_indexes = {}
+        for parent_id in parent_ids:
+            prefix = f"{parent_id}-"
+            for page in index.list(prefix=prefix, namespace="default-namespace"):
+                for chunk_id in _page_ids(page):
+                    if _CHUNK_SUFFIX_RE.fullmatch(chunk_id, len(prefix)):
+                        chunk_indexes[chunk_id] = None
+        return chunk_indexes
+
+    def update_documents(self, collection_name: str, doc_ids: List[str], chunks: Iterable[Dict[str, Any]]) -> int:
+        # Delete by filter (parent_document_id) in one call; a failure aborts the update
+        # so old chunks are never silently left next to the new ones
+        self.delete_by_parent_ids(collection_name, doc_ids)
         # Add new chunks
-        self.add_documents(collection_name, chunks)
-        return len(chunks)
+        return len(self.add_documents(collection_name, chunks))
 
     def delete_documents(self, collection_name: str, doc_ids: List[str]) -> None:
         index = self._get_or_create_index(collection_name)
-        index.delete(ids=doc_ids)
+        index.delete(ids=doc_ids, namespace="default-namespace")
 
     def search_similarity(
         self,
@@ -130,21 +236,12 @@ class PineconeService:
         threshold: float = settings.DEFAULT_SIMILARITY_THRESHOLD,
         where: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, List]:
-        start_ts = time.time()
-        print(
-            f"[Pinecone] search start at {datetime.now().isoformat()} "
-            f"collection='{collection_name}' query='{query}' n_results={n_results}"
-        )
+        start_ts = time.perf_counter()
         index = self._get_or_create_index(collection_name)
-        duration_ms = (time.time() - start_ts) * 1000
-        print(
-            f"[Pinecone] get or create collection in {duration_ms:.2f} ms, "
-        )
 
         query = {
             "inputs": {"text": query}, 
             "top_k": n_results,
-            # "filter": where
         }
 
         if where:
@@ -153,52 +250,48 @@ class PineconeService:
         res = index.search(
             namespace="default-namespace", 
             query=query,
-            # fields=["content", "metadata"]
         )
-        duration_ms = (time.time() - start_ts) * 1000
-        print(
-            f"[Pinecone] search to rag in {duration_ms:.2f} ms, "
-            f"hits={len(res['result']['hits'])}"
-        )
-        filtered_results = {"ids": [], "distances": [], "metadatas": [], "documents": []}
-        for match in res["result"]["hits"]:
-            score = match.get("_score", 0.0)
-            if threshold is not None and score < threshold:
-                continue
-
-            filtered_results["ids"].append(match["_id"])
-            filtered_results["distances"].append(score)
-            metas = {}
-
-            for key, value in match.get("fields", {}).items():
-                if key == "content":
-                    continue
-                metas[key] = value
-
-            filtered_results["metadatas"].append(metas)
-            filtered_results["documents"].append(match.get("fields", {}).get("content", ""))
-        duration_ms = (time.time() - start_ts) * 1000
-        print(
-            f"[Pinecone] search finished in {duration_ms:.2f} ms, "
-            f"hits={len(filtered_results['ids'])}"
+
+        hits = res.result.hits
+        if threshold is not None:
+            hits = [hit for hit in hits if hit.score >= threshold]
+        fields = [hit.fields or {} for hit in hits]
+        filtered_results = {
+            "ids": [hit.id for hit in hits],
+            "distances": [hit.score for hit in hits],
+            "metadatas": [{key: value for key, value in f.items() if key != "content"} for f in fields],
+            "documents": [f.get("content", "") for f in fields],
+        }
+        logger.debug(
+            "[Pinecone] search collection='%s' n_results=%s finished in %.2f ms, hits=%d",
+            collection_name, n_results, (time.perf_counter() - start_ts) * 1000, len(hits)
         )
         return filtered_results
 
     def list_collections(self) -> List[str]:
+        """List index names, cached briefly since they only change on create/delete."""
         if not self.pc:
             return []
-        return [idx.name for idx in self.pc.list_indexes()]
+        cached = self._list_cache
+        if cached is not None and cached[0] > time.monotonic():
+            return list(cached[1])
+        names = self.pc.list_indexes().names()
+        self._list_cache = (time.monotonic() + self._list_cache_ttl, names)
+        return list(names)
 
     def delete_collection(self, name: str) -> None:
         if not self.pc:
             return
         index_name = self._index_name(name)
-        self.pc.delete_index(index_name)
+        with self._index_cache_lock:
+            self._index_cache.pop(index_name, None)
+            self.pc.delete_index(index_name)
+            self._list_cache = None
 
     def get_documents_by_metadata(
         self,
         collection_name: str,
-        metadata_filter: Dict[str, Any],
+        metadata_filter: Optional[Dict[str, Any]] = None,
         limit: int = 100
     ) -> Dict[str, List]:
         """
@@ -206,60 +299,48 @@ class PineconeService:
         
         Args:
             collection_name: Name of the collection to search in
-            metadata_filter: Dictionary of metadata key-value pairs to filter by
+            metadata_filter: Dictionary of metadata key-value pairs to filter by (None lists any documents)
             limit: Maximum number of documents to return (default: 100)
             
         Returns:
             Dictionary with keys: ids, metadatas, documents
+            
+        Raises:
+            CollectionNotFoundError: If the collection's index does not exist
         """
-        start_ts = time.time()
-        print(
-            f"[Pinecone] get_documents_by_metadata start at {datetime.now().isoformat()} "
-            f"collection='{collection_name}' filter={metadata_filter} limit={limit}"
-        )
-        
-        index = self._get_or_create_index(collection_name)
+        start_ts = time.perf_counter()
+        index = self._get_or_create_index(collection_name, create=False)
         
         try:
-            # Use Pinecone's query with metadata filter
-            # Note: This uses a dummy vector query with metadata filter
-            # Since Pinecone requires a vector for querying, we'll use a zero vector
-            # and rely on the metadata filter to get the desired results
-            res = index.query(
-                namespace="default-namespace",
-                vector=[0.0] * 1536,  # Dummy vector (adjust dimensions as needed)
-                top_k=limit,
-                include_metadata=True,
-                include_values=False,
-                filter=metadata_filter
-            )
-            
-            duration_ms = (time.time() - start_ts) * 1000
-            print(
-                f"[Pinecone] metadata query completed in {duration_ms:.2f} ms, "
-                f"matches={len(res.matches)}"
-            )
-            
-            # Format results to match expected structure
-            filtered_results = {"ids": [], "metadatas": [], "documents": []}
+            if metadata_filter:
+                # Metadata-only lookup; no query vector or similarity scoring involved
+                vectors = index.fetch_by_metadata(
+                    filter=metadata_filter,
+                    namespace="default-namespace",
+                    limit=limit
+                ).vectors
+            else:
+                ids: List[str] = []
+                for page in index.list(namespace="default-namespace", limit=min(limit, 100)):
+                    ids.extend(_page_ids(page))
+                    if len(ids) >= limit:
+                        break
+                vectors = index.fetch(ids=ids[:limit], namespace="default-namespace").vectors if ids else {}
             
-            for match in res.matches:
-                filtered_results["ids"].append(match.id)
-                filtered_results["metadatas"].append(match.metadata or {})
-                # Extract content from metadata if available
-                content = match.metadata.get("content", "") if match.metadata else ""
-                filtered_results["documents"].append(content)
-            
-            duration_ms = (time.time() - start_ts) * 1000
-            print(
-                f"[Pinecone] get_documents_by_metadata finished in {duration_ms:.2f} ms, "
-                f"results={len(filtered_results['ids'])}"
+            metadatas = [vector.metadata or {} for vector in vectors.values()]
+            filtered_results = {
+                "ids": list(vectors),
+                "metadatas": metadatas,
+                "documents": [metadata.get("content", "") for metadata in metadatas],
+            }
+            logger.debug(
+                "[Pinecone] get_documents_by_metadata collection='%s' filter=%s finished in %.2f ms, results=%d",
+                collection_name, metadata_filter, (time.perf_counter() - start_ts) * 1000, len(filtered_results["ids"])
             )
-            
             return filtered_results
             
         except Exception as e:
-            print(f"[Pinecone] Error in get_documents_by_metadata: {str(e)}")
+            logger.error("[Pinecone] Error in get_documents_by_metadata: %s", e)
             return {"ids": [], "metadatas": [], "documents": []}
 
         
\ No newline at end of file
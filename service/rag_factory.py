@@ -1,3 +1,4 @@
+import threading
 from typing import Optional
 from config import settings
 from service.chromadb import ChromaDBService
@@ -5,19 +6,26 @@ from service.pinecone_service import PineconeService
 
 
 _singleton_cache = {}
+_singleton_lock = threading.Lock()
 
 
 def get_rag_service(rag_server: Optional[str] = None, embedding_model: Optional[str] = None):
     """Return a RAG backend service instance based on configuration or parameter."""
-    backend = (rag_server or settings.RAG_SERVER).lower()
+    backend = (rag_server or settings.RAG_SERVER).strip().lower()
+    # Model names are case-sensitive (e.g. "all-MiniLM-L6-v2"), so only trim them
+    embedding_model = (embedding_model or "").strip() or None
     key = f"{backend}:{embedding_model or ''}"
-    if key in _singleton_cache:
-        return _singleton_cache[key]
+    svc = _singleton_cache.get(key)
+    if svc is not None:
+        return svc
 
-    if backend == "pinecone":
-        svc = PineconeService(embedding_model=embedding_model)
-    else:
-        svc = ChromaDBService(embedding_model=embedding_model)
-
-    _singleton_cache[key] = svc
+    # Handlers run in a threadpool; build each service (and its clients) only once
+    with _singleton_lock:
+        svc = _singleton_cache.get(key)
+        if svc is None:
+            if backend == "pinecone":
+                svc = PineconeService(embedding_model=embedding_model)
+            else:
+                svc = ChromaDBService(embedding_model=embedding_model)
+            _singleton_cache[key] = svc
     return svc
\ No newline at end of file
@@ -0,0 +1,21 @@
+import os
+import unittest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from chunkers import TextChunker
+
+
+class TextChunkerOverlapTest(unittest.TestCase):
+    def test_overlap_starts_on_word_boundary(self):
+        chunks = TextChunker().chunk("alpha beta gamma\n\n" + "B" * 90, chunk_size=100, chunk_overlap=8)
+        self.assertEqual([chunk.content for chunk in chunks], ["alpha beta gamma", "gamma\n\n" + "B" * 90])
+
+    def test_no_overlap_from_long_token_without_whitespace(self):
+        token = "A" * 80
+        chunks = TextChunker().chunk(f"x {token}\n\nnext", chunk_size=84, chunk_overlap=30)
+        self.assertEqual([chunk.content for chunk in chunks], [f"x {token}", "next"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import unittest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from pydantic import ValidationError
+from models.document import Document
+
+
+class DocumentChunkOverlapTest(unittest.TestCase):
+    def test_chunk_size_only_scales_default_overlap(self):
+        doc = Document(uid="a", content="text", chunk_size=100)
+        self.assertEqual(doc.chunk_size, 100)
+        self.assertEqual(doc.chunk_overlap, 20)
+
+    def test_chunk_size_one_gets_no_overlap(self):
+        doc = Document(uid="a", content="text", chunk_size=1)
+        self.assertEqual(doc.chunk_overlap, 0)
+
+    def test_defaults_unchanged(self):
+        doc = Document(uid="a", content="text")
+        self.assertEqual((doc.chunk_size, doc.chunk_overlap), (1000, 200))
+
+    def test_explicit_overlap_not_below_size_rejected(self):
+        with self.assertRaises(ValidationError):
+            Document(uid="a", content="text", chunk_size=10, chunk_overlap=50)
+        with self.assertRaises(ValidationError):
+            Document(uid="a", content="text", chunk_size=10, chunk_overlap=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import json
+import math
+import unittest
+
+from jsonutil import json_loads
+
+
+class JsonLoadsTest(unittest.TestCase):
+    def test_integer_beyond_64_bits_stays_exact(self):
+        self.assertEqual(json_loads('{"id": 12345678901234567890123}'), {"id": 12345678901234567890123})
+        self.assertEqual(json_loads('[-9223372036854775809, 1.5]'), [-9223372036854775809, 1.5])
+
+    def test_long_digit_string_is_left_alone(self):
+        self.assertEqual(json_loads('{"id": "12345678901234567890123"}'), {"id": "12345678901234567890123"})
+
+    def test_non_finite_values_parse_like_json(self):
+        value = json_loads('[NaN, 1]')
+        self.assertTrue(math.isnan(value[0]))
+        self.assertEqual(value[1], 1)
+        self.assertEqual(json_loads('[Infinity, -Infinity]'), [math.inf, -math.inf])
+        self.assertEqual(json_loads('[1e400]'), [math.inf])
+
+    def test_invalid_json_raises_json_decode_error(self):
+        with self.assertRaises(json.JSONDecodeError):
+            json_loads('{"a": }')
+
+
+if __name__ == "__main__":
+    unittest.main()